@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Es el punto de entrada que usa daphne (`manage.py runserver` con 'daphne' en
+INSTALLED_APPS). El stream SSE de /api/events/ necesita ASGI: bajo WSGI cada
+conexión abierta bloquearía un hilo del servidor.
 """
 
 import os
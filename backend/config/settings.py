@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +32,8 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    # daphne reemplaza runserver por un servidor ASGI (necesario para /api/events/)
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -45,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # Comprime (gzip) las respuestas de más de GZIP_MIN_LENGTH bytes
+    'tasks.middleware.ThresholdGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,17 +77,65 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# El motor se elige con DB_ENGINE ("postgres" en docker-compose, "sqlite" por defecto).
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'taskdb'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # DB_CONN_MAX_AGE > 0 (conexiones persistentes) solo sirve bajo WSGI.
+            # Con ASGI (daphne, también en runserver) el código sync de cada
+            # request corre en un hilo nuevo y las conexiones son por hilo:
+            # nunca se reutilizan y quedan abiertas hasta vencer. Ahí se usa el pool.
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+            # Antes de reutilizar una conexión se verifica que siga viva
+            # (con pool: el pool valida cada conexión al entregarla).
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # Pool de conexiones de psycopg 3 (por defecto; DB_POOL=false para desactivarlo).
+    if os.environ.get('DB_POOL', 'true').lower() in ('1', 'true', 'yes'):
+        DATABASES['default']['CONN_MAX_AGE'] = 0  # el pool ya las reutiliza
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+            'OPTIONS': {
+                # Espera hasta 20 s si la DB está bloqueada en lugar de fallar
+                # con "database is locked".
+                'timeout': 20,
+                # IMMEDIATE: toma el lock de escritura al empezar la transacción
+                # (evita deadlocks al pasar de lectura a escritura).
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: las lecturas no bloquean a las escrituras ni al revés.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -131,6 +184,9 @@ STATIC_URL = 'static/'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Respuestas más chicas que esto (bytes) no se comprimen: no vale la CPU
+GZIP_MIN_LENGTH = 1024
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -139,4 +195,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-}
\ No newline at end of file
+}
+
+# Broker de eventos en vivo (GET /api/events/). InProcessBroker reparte dentro
+# del proceso; con varios procesos ASGI usar un broker compartido.
+EVENTS_BROKER = 'tasks.events.InProcessBroker'
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Task, Category, Profile, Subtask
+from .models import Task, Category, Profile, Subtask, TaskStats, ArchivedTask, ArchivedSubtask
 
 # 1. Definimos un "Inline" para editar el Perfil dentro del Usuario
 class ProfileInline(admin.StackedInline):
@@ -30,7 +30,7 @@ class SubtaskInline(admin.TabularInline):
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     inlines = (SubtaskInline,)
-    list_display = ('title', 'user', 'category', 'completed', 'due_date', 'created_at')
+    list_display = ('title', 'user', 'category', 'completed', 'due_date', 'subtask_count', 'subtasks_completed', 'created_at')
     
     # list_filter: Agrega una barra lateral derecha para filtrar datos rápidamente.
     # Podrás hacer clic en "Completed: Yes" o elegir una categoría específica.
@@ -52,4 +52,28 @@ class SubtaskAdmin(admin.ModelAdmin):
     list_filter = ('completed', 'category')
     search_fields = ('title', 'description')
     list_select_related = ('task', 'category')
-    autocomplete_fields = ('task', 'category')
\ No newline at end of file
+    autocomplete_fields = ('task', 'category')
+
+
+@admin.register(TaskStats)
+class TaskStatsAdmin(admin.ModelAdmin):
+    # Solo lectura: los valores los mantienen los signals / rebuild_task_stats
+    list_display = ('user', 'category', 'total', 'completed', 'archived')
+    list_select_related = ('user', 'category')
+    readonly_fields = ('user', 'category', 'total', 'completed', 'archived')
+
+
+class ArchivedSubtaskInline(admin.TabularInline):
+    model = ArchivedSubtask
+    extra = 0
+    can_delete = False
+
+
+@admin.register(ArchivedTask)
+class ArchivedTaskAdmin(admin.ModelAdmin):
+    # El archivo lo llena el comando archive_tasks
+    inlines = (ArchivedSubtaskInline,)
+    list_display = ('title', 'user', 'category', 'created_at', 'archived_at')
+    list_filter = ('category',)
+    search_fields = ('title', 'description')
+    list_select_related = ('user', 'category')
@@ -1,8 +1,209 @@
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import openai
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.exceptions import OutputParserException
+
+
+# =========================================================================
+# EJECUCIÓN PROTEGIDA DE LLAMADAS AL LLM
+# =========================================================================
+# Si el proveedor se pone lento, sin límites cada hilo del servidor queda
+# esperando en chain.invoke y se traba toda la API. Por eso cada llamada pasa por:
+#   1. Circuit breaker: tras varios fallos seguidos dejamos de llamar un rato.
+#   2. Semáforo global: como mucho AI_MAX_CONCURRENCY llamadas en vuelo.
+#   3. Deadline: tiempo total máximo por llamada (incluye reintentos). Cada intento
+#      corre en un hilo aparte y lo esperamos como mucho lo que queda: el timeout
+#      del cliente HTTP es por fase (conectar, cada lectura...), así que una
+#      respuesta que llega de a gotas podría pasarse del deadline.
+#   4. Reintentos con backoff exponencial + jitter para errores transitorios.
+
+class AIUnavailableError(Exception):
+    """La llamada no se hizo o no terminó a tiempo (breaker abierto, sin cupo, deadline)."""
+
+
+# Errores del proveedor que vale la pena reintentar
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Errores que indican que el proveedor no está disponible para nosotros (abren el
+# breaker). Otros errores (ej. 400 BadRequest) son de la petición: no cuentan.
+BREAKER_ERRORS = RETRYABLE_ERRORS + (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+)
+
+
+class CircuitBreaker:
+    """
+    closed: las llamadas pasan. Tras `failure_threshold` fallos seguidos -> open.
+    open: se rechaza todo hasta que pasen `reset_timeout` segundos -> half_open.
+    half_open: se deja pasar UNA llamada de prueba; si sale bien -> closed, si no -> open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel(self):
+        """La llamada autorizada por allow() no llegó a hacerse (ej. sin cupo)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+            self._probing = False
+
+
+class LLMGuard:
+    def __init__(self, max_concurrency=4, timeout=10.0, max_attempts=3,
+                 backoff_base=0.5, backoff_max=4.0, slot_wait=1.0, breaker=None):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.slot_wait = slot_wait
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Un hilo por cupo: el semáforo garantiza que nunca se encolen tareas
+        self.executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix='llm')
+        self.breaker = breaker or CircuitBreaker()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", "4")),
+            timeout=float(os.environ.get("AI_TIMEOUT_SECONDS", "10")),
+            max_attempts=int(os.environ.get("AI_MAX_ATTEMPTS", "3")),
+            slot_wait=float(os.environ.get("AI_SLOT_WAIT_SECONDS", "1")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.environ.get("AI_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.environ.get("AI_BREAKER_RESET_SECONDS", "30")),
+            ),
+        )
+
+    def invoke(self, build_chain, inputs):
+        """
+        Ejecuta `build_chain(timeout).invoke(inputs)` con las protecciones de arriba.
+        `build_chain` recibe los segundos que quedan del deadline para configurar el
+        timeout HTTP del cliente. Lanza AIUnavailableError o el error del proveedor.
+        """
+        # 1. Breaker abierto: fallamos sin esperar
+        if not self.breaker.allow():
+            raise AIUnavailableError("Circuit breaker abierto: la IA viene fallando.")
+
+        deadline = time.monotonic() + self.timeout
+
+        # 2. Cupo de llamadas simultáneas (esperamos poco: mejor fallar que encolar hilos)
+        if not self.semaphore.acquire(timeout=min(self.slot_wait, self.timeout)):
+            # No llegamos a llamar: no cuenta ni como éxito ni como fallo del proveedor
+            self.breaker.cancel()
+            raise AIUnavailableError("Demasiadas llamadas a la IA en curso.")
+        release = True
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.breaker.record_failure()
+                    raise AIUnavailableError("Se agotó el tiempo de la llamada a la IA.")
+                # 3. El timeout del cliente nunca supera lo que queda del deadline,
+                #    y tampoco lo esperamos más que eso
+                future = self.executor.submit(lambda timeout=remaining: build_chain(timeout).invoke(inputs))
+                try:
+                    result = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    # El intento sigue en vuelo hasta que el cliente se rinda:
+                    # su cupo se libera recién cuando termine.
+                    release = False
+                    future.add_done_callback(lambda _: self.semaphore.release())
+                    self.breaker.record_failure()
+                    raise AIUnavailableError("Se agotó el tiempo de la llamada a la IA.")
+                except OutputParserException:
+                    # El proveedor respondió (mal formato): no es un problema de disponibilidad
+                    self.breaker.record_success()
+                    raise
+                except RETRYABLE_ERRORS:
+                    if attempt >= self.max_attempts:
+                        self.breaker.record_failure()
+                        raise
+                    # 4. Backoff exponencial con "full jitter", sin pasarnos del deadline
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                    time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+                    continue
+                except BREAKER_ERRORS:
+                    self.breaker.record_failure()
+                    raise
+                except Exception:
+                    # Error de la petición o nuestro: no dice nada de la disponibilidad
+                    self.breaker.cancel()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            if release:
+                self.semaphore.release()
+
+
+# Instancia compartida por todo el proceso (configurable por variables de entorno)
+llm_guard = LLMGuard.from_env()
+
+
+def _llm(temperature, timeout):
+    # max_retries=0: los reintentos los maneja LLMGuard (con deadline y jitter)
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=temperature,
+        timeout=timeout,
+        max_retries=0,
+        base_url=os.environ.get("OPENAI_BASE_URL") or None,
+    )
 
 
 def suggest_category(title: str, description: str, categories: list[str]) -> str:
@@ -10,11 +211,7 @@ def suggest_category(title: str, description: str, categories: list[str]) -> str
     #    Ej: "Trabajo, Personal, Salud"
     categories_str = ", ".join(categories)
 
-    # 2. Inicializamos el modelo de chat (GPT-4o mini es rápido y económico)
-    #    temperature=0 hace que sea determinista (siempre responde lo mismo ante el mismo input)
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    # 3. Definimos la plantilla del prompt (Instrucciones para la IA)
+    # 2. Definimos la plantilla del prompt (Instrucciones para la IA)
     prompt = ChatPromptTemplate.from_messages([
         # Rol del sistema: Define comportamiento general
         ("system", "Eres un asistente experto en productividad. Tu trabajo es categorizar tareas."),
@@ -28,25 +225,32 @@ def suggest_category(title: str, description: str, categories: list[str]) -> str
                  "Descripción: {description}")
     ])
 
-    # 4. Creamos la "cadena" (Chain): Prompt -> Modelo -> Parser de Texto
+    # 3. Creamos la "cadena" (Chain): Prompt -> Modelo -> Parser de Texto
     #    El Parser asegura que obtengamos un string limpio en lugar de un objeto mensaje complejo
-    chain = prompt | llm | StrOutputParser()
+    #    Modelo: GPT-4o mini (rápido y económico); temperature=0 lo hace determinista
+    def build_chain(timeout):
+        return prompt | _llm(0, timeout) | StrOutputParser()
     
     try:
-        # 5. Ejecutamos la cadena enviando los datos dinámicos
-        response = chain.invoke({
+        # 4. Ejecutamos la cadena (protegida por llm_guard) enviando los datos dinámicos
+        response = llm_guard.invoke(build_chain, {
             "title": title, 
             "description": description
         })
         return response.strip() # Limpiamos espacios en blanco extra
+    except AIUnavailableError:
+        # IA caída o saturada: que decida quien llama (ej. responder 503),
+        # no categorizar todo como "General" durante la caída
+        raise
+    except BREAKER_ERRORS as e:
+        # Igual si agotamos los reintentos (sin internet, API key inválida...)
+        raise AIUnavailableError(f"La IA no está disponible: {e}") from e
     except Exception as e:
-        # Si falla (ej. sin internet, API key inválida), devolvemos una categoría por defecto
+        # Otro error (ej. petición rechazada): devolvemos una categoría por defecto
         print(f"Error al categorizar la tarea: {e}")
         return "General"
 
 def suggest_next_subtask(task_title, existing_subtasks=[]) -> dict:
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.4) 
-
     existing_str = ", ".join(existing_subtasks) if existing_subtasks else "Ninguna"
 
     prompt = ChatPromptTemplate.from_messages([
@@ -58,10 +262,11 @@ def suggest_next_subtask(task_title, existing_subtasks=[]) -> dict:
                  "Ejemplo: {{ \"title\": \"Investigar librerías\", \"description\": \"Comparar opciones en Github\" }}")
     ])
 
-    chain = prompt | llm | JsonOutputParser()
+    def build_chain(timeout):
+        return prompt | _llm(0.4, timeout) | JsonOutputParser()
 
     try:
-        response = chain.invoke({})
+        response = llm_guard.invoke(build_chain, {})
         return response 
     except Exception as e:
         print(f"Error AI Next Subtask: {e}")
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class TasksConfig(AppConfig):
     name = 'tasks'
+
+    def ready(self):
+        # Conecta los signals que mantienen las estadísticas (tasks/signals.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+"""
+Archivo de tareas completadas.
+
+Las tareas completadas hace más de N días se copian a `ArchivedTask` /
+`ArchivedSubtask` y se borran de `tasks_task` / `tasks_subtask`, así las
+tablas que usan las vistas habituales solo contienen datos recientes.
+
+Se procesa por lotes, cada uno en su propia transacción: si el proceso se
+corta, los lotes ya confirmados quedan archivados y volver a correrlo
+continúa con lo que falta (las tareas movidas ya no cumplen el filtro).
+
+El borrado de cada lote se hace con los signals silenciados (serían varias
+consultas por fila): las estadísticas se recalculan una vez por lote para los usuarios
+afectados y se publica un task.deleted por tarea, igual que un borrado normal.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, stats
+from .signals import muted
+from .models import ArchivedSubtask, ArchivedTask, Subtask, Task
+
+
+def archivable_tasks(older_than_days):
+    """Tareas completadas hace más de `older_than_days` días."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Task.objects.filter(completed=True, completed_at__lt=cutoff)
+
+
+def archive_batch(task_ids, older_than_days):
+    """Mueve al archivo las tareas indicadas (y sus subtareas) en una transacción."""
+    with transaction.atomic():
+        # select_for_update: que nadie las modifique mientras las copiamos.
+        # Volvemos a aplicar el filtro completo: entre la búsqueda de ids y el
+        # lock una tarea pudo descompletarse y completarse de nuevo.
+        tasks = list(
+            archivable_tasks(older_than_days)
+            .select_for_update()
+            .filter(pk__in=task_ids)
+            .order_by('pk')
+        )
+        if not tasks:
+            return 0
+        ids = [task.pk for task in tasks]
+        subtasks = Subtask.objects.filter(task_id__in=ids).order_by('pk')
+
+        ArchivedTask.objects.bulk_create([
+            ArchivedTask(
+                id=task.pk,
+                title=task.title,
+                description=task.description,
+                completed=task.completed,
+                user_id=task.user_id,
+                category_id=task.category_id,
+                ai_classification=task.ai_classification,
+                created_at=task.created_at,
+                due_date=task.due_date,
+                completed_at=task.completed_at,
+                subtask_count=task.subtask_count,
+                subtasks_completed=task.subtasks_completed,
+            )
+            for task in tasks
+        ])
+        ArchivedSubtask.objects.bulk_create([
+            ArchivedSubtask(
+                id=sub.pk,
+                task_id=sub.task_id,
+                title=sub.title,
+                description=sub.description,
+                completed=sub.completed,
+                category_id=sub.category_id,
+                created_at=sub.created_at,
+                due_date=sub.due_date,
+            )
+            for sub in subtasks.iterator()
+        ])
+        # Sin signals: primero las subtareas (FK a Task) y después las tareas
+        with muted():
+            Subtask.objects.filter(task_id__in=ids).delete()
+            Task.objects.filter(pk__in=ids).delete()
+
+        stats.rebuild_user_stats({task.user_id for task in tasks})
+        for task in tasks:
+            events.publish(task.user_id, 'task.deleted', {'id': task.pk})
+        return len(ids)
+
+
+def archive_completed_tasks(older_than_days, batch_size=500):
+    """
+    Archiva por lotes. Es un generador: devuelve la cantidad movida en cada
+    lote para que el comando pueda informar el progreso.
+    """
+    last_pk = 0
+    while True:
+        # Avanzamos por pk para no volver a leer filas que otro proceso
+        # haya dejado sin archivar (ej. porque se descompletaron).
+        ids = list(
+            archivable_tasks(older_than_days)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        last_pk = ids[-1]
+        yield archive_batch(ids, older_than_days)
@@ -0,0 +1,144 @@
+"""
+Eventos en vivo para el frontend (Server-Sent Events).
+
+El flujo es:
+1. Los signals / vistas llaman a `publish(user_id, event_type, data)`.
+2. El broker reparte el evento a cada conexión abierta de ese usuario.
+3. La vista async `event_stream` (GET /api/events/) lo escribe en el stream SSE.
+
+El broker se elige con el setting `EVENTS_BROKER` (ruta a una clase). Por
+defecto usamos `InProcessBroker`, que reparte dentro del mismo proceso: sirve
+con un único proceso ASGI (uvicorn/daphne con 1 worker). Con varios procesos
+hace falta un broker compartido (ej. Redis pub/sub) que implemente `Broker`.
+"""
+
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Broker:
+    """Interfaz mínima que debe cumplir cualquier broker de eventos."""
+
+    def publish(self, user_id, event):
+        """Entrega `event` (dict) a todos los suscriptores de `user_id`. Debe poder llamarse desde cualquier hilo."""
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Devuelve una `Subscription` para `user_id`. Se llama desde el event loop de la vista."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        """Da de baja una suscripción (la vista lo hace al cerrarse la conexión)."""
+        raise NotImplementedError
+
+    def has_subscribers(self, user_id):
+        """True si vale la pena armar el evento (permite saltarse el trabajo si nadie escucha)."""
+        return True
+
+    def has_any_subscribers(self):
+        """True si hay alguna conexión abierta (de cualquier usuario)."""
+        return True
+
+
+class Subscription:
+    """Cola async de un suscriptor. La vista la consume con `await sub.get(timeout)`."""
+
+    def __init__(self, broker, user_id, maxsize=100):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        # Se llama desde cualquier hilo: lo pasamos al event loop del suscriptor
+        self.loop.call_soon_threadsafe(self._put_nowait, event)
+
+    def _put_nowait(self, event):
+        # Si el cliente no lee (conexión lenta) descartamos en lugar de crecer sin límite
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Devuelve el próximo evento, o None si pasa `timeout` segundos sin eventos."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    """Broker en memoria: un set de suscripciones por usuario."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            try:
+                sub.put(event)
+            except RuntimeError:
+                # El event loop del suscriptor ya se cerró
+                sub.close()
+
+    def subscribe(self, user_id):
+        sub = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def has_subscribers(self, user_id):
+        with self._lock:
+            return bool(self._subscribers.get(user_id))
+
+    def has_any_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Instancia única del broker configurado en settings.EVENTS_BROKER."""
+    path = getattr(settings, 'EVENTS_BROKER', 'tasks.events.InProcessBroker')
+    return import_string(path)()
+
+
+def publish(user_id, event_type, data):
+    """
+    Publica un evento para `user_id`. Ej: publish(3, 'task.updated', {'id': 10, ...}).
+
+    `data` puede ser un callable: solo se evalúa si el usuario tiene alguna
+    conexión abierta. El envío espera al commit de la transacción en curso
+    para no avisar de cambios que terminan en rollback.
+    """
+    broker = get_broker()
+    if not broker.has_subscribers(user_id):
+        return
+    if callable(data):
+        data = data()
+    event = {'type': event_type, 'data': data}
+    transaction.on_commit(lambda: broker.publish(user_id, event))
+
+
+def format_sse(event):
+    """Serializa un evento al formato de texto de SSE."""
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
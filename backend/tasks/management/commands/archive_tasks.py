@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.archive import archivable_tasks, archive_completed_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a las tablas de archivo las tareas completadas hace más de "
+        "--days días (con sus subtareas). Trabaja por lotes de --batch-size, cada uno "
+        "en su propia transacción: si se interrumpe, volver a correrlo continúa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántas tareas se archivarían.',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--days debe ser >= 0 y --batch-size >= 1.")
+
+        if options['dry_run']:
+            count = archivable_tasks(options['days']).count()
+            self.stdout.write(f"Se archivarían {count} tareas.")
+            return
+
+        total = 0
+        for moved in archive_completed_tasks(options['days'], options['batch_size']):
+            total += moved
+            self.stdout.write(f"Lote archivado: {moved} tareas (total {total}).")
+        self.stdout.write(self.style.SUCCESS(f"Archivadas {total} tareas."))
@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from tasks.models import Category, Subtask, Task
+from tasks.renderers import FastJSONRenderer
+from tasks.views import TaskViewSet
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de GET /api/tasks/: CPU y bytes (sin comprimir / gzip) para listas "
+        "de N tareas, comparando serializer vs .values() y el JSONRenderer de DRF vs "
+        "FastJSONRenderer (orjson), en modo completo y compacto. Los datos de prueba "
+        "se crean dentro de una transacción que se descarta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3, help='Corridas por caso (se toma la mejor).')
+        parser.add_argument('--subtasks', type=int, default=2, help='Subtareas por tarea.')
+
+    def handle(self, *args, **options):
+        # (nombre, query string, renderers, usar .values())
+        cases = [
+            ('full / serializer / DRF', '', [JSONRenderer], False),
+            ('full / serializer / orjson', '', [FastJSONRenderer], False),
+            ('compact / serializer / DRF', '?compact=true', [JSONRenderer], False),
+            ('compact / serializer / orjson', '?compact=true', [FastJSONRenderer], False),
+            ('compact / values / DRF', '?compact=true', [JSONRenderer], True),
+            ('compact / values / orjson', '?compact=true', [FastJSONRenderer], True),
+        ]
+        self.stdout.write(f"{'tareas':>7}  {'caso':<30} {'CPU ms':>9} {'bytes':>11} {'gzip':>10}")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    user = self._populate(size, options['subtasks'])
+                    for name, query, renderers, fast_path in cases:
+                        cpu, raw, gz = self._measure(user, query, renderers, fast_path, options['repeat'])
+                        self.stdout.write(f"{size:>7}  {name:<30} {cpu * 1000:>9.1f} {raw:>11} {gz:>10}")
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _populate(self, size, subtasks_per_task):
+        user = User.objects.create_user(username='__bench_task_list__')
+        category = Category.objects.create(name='Bench')
+        tasks = Task.objects.bulk_create([
+            Task(
+                user=user, category=category, title=f'Tarea de prueba {i}',
+                description='Descripción de prueba ' * 3, completed=i % 3 == 0,
+            )
+            for i in range(size)
+        ])
+        Subtask.objects.bulk_create([
+            Subtask(task=task, title=f'Paso {j}', category=category)
+            for task in tasks
+            for j in range(subtasks_per_task)
+        ])
+        return user
+
+    def _measure(self, user, query, renderers, fast_path, repeat):
+        factory = APIRequestFactory()
+        view = TaskViewSet.as_view(
+            {'get': 'list'}, renderer_classes=renderers, values_fast_path=fast_path
+        )
+        best = None
+        for _ in range(repeat):
+            request = factory.get(f'/api/tasks/{query}')
+            force_authenticate(request, user=user)
+            start = time.process_time()
+            response = view(request)
+            response.render()
+            cpu = time.process_time() - start
+            best = cpu if best is None else min(best, cpu)
+        content = response.content
+        return best, len(content), len(compress_string(content))
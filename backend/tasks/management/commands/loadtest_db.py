@@ -0,0 +1,101 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.models import Category, Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de la conexión a la DB: varios hilos simulan requests "
+        "(abrir/reutilizar conexión + listar tareas) y se compara el throughput "
+        "sin conexiones persistentes, con CONN_MAX_AGE y, en Postgres con "
+        "psycopg 3, con pool de conexiones. Ojo: cada hilo reutiliza su conexión "
+        "durante toda la prueba, como un worker WSGI. Bajo ASGI (daphne) cada "
+        "request corre en un hilo nuevo, así que la cifra de 'persistentes' no "
+        "aplica ahí: en ese caso compare sin persistencia vs pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests por hilo.')
+        parser.add_argument('--tasks', type=int, default=50, help='Tareas del usuario de prueba.')
+
+    def handle(self, *args, **options):
+        base = connections['default'].settings_dict
+        modes = [
+            ('sin persistencia (CONN_MAX_AGE=0)', {'CONN_MAX_AGE': 0}, {}),
+            ('persistentes (CONN_MAX_AGE=60)', {'CONN_MAX_AGE': 60}, {}),
+        ]
+        if base['ENGINE'] == 'django.db.backends.postgresql':
+            pool = {'min_size': options['threads'], 'max_size': options['threads']}
+            modes.append(('pool psycopg (max_size=hilos)', {'CONN_MAX_AGE': 0}, {'pool': pool}))
+
+        user = User.objects.create_user(username='__loadtest_db__')
+        try:
+            category = Category.objects.create(name='Loadtest')
+            Task.objects.bulk_create([
+                Task(user=user, category=category, title=f'Tarea {i}')
+                for i in range(options['tasks'])
+            ])
+            self.stdout.write(f"{'modo':<36} {'req/s':>9} {'ms/req':>8}")
+            for index, (name, overrides, extra_options) in enumerate(modes):
+                # Un alias por modo: el hilo principal cachea la conexión por alias
+                # y _close necesita la del modo actual (ej. para cerrar su pool).
+                alias = f"loadtest_{index}"
+                connections.settings[alias] = {
+                    **base,
+                    **overrides,
+                    'OPTIONS': {**base['OPTIONS'], **extra_options},
+                }
+                try:
+                    rate = self._run(alias, user.pk, options['threads'], options['requests'])
+                finally:
+                    self._close(alias)
+                self.stdout.write(f"{name:<36} {rate:>9.0f} {1000 * options['threads'] / rate:>8.2f}")
+        finally:
+            user.delete()
+            Category.objects.filter(name='Loadtest').delete()
+
+    def _run(self, alias, user_id, threads, requests):
+        errors = []
+
+        def worker():
+            conn = connections[alias]
+            try:
+                for _ in range(requests):
+                    # Lo mismo que hace Django con request_started/request_finished
+                    conn.close_if_unusable_or_obsolete()
+                    list(
+                        Task.objects.using(alias)
+                        .filter(user_id=user_id)
+                        .select_related('category')
+                        .order_by('-created_at')[:50]
+                    )
+                    conn.close_if_unusable_or_obsolete()
+            except Exception as e:  # se informa al final
+                errors.append(e)
+            finally:
+                conn.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+
+        if errors:
+            raise CommandError(f"{len(errors)} hilos fallaron: {errors[0]}")
+        return threads * requests / elapsed
+
+    def _close(self, alias):
+        conn = connections[alias]
+        if getattr(conn, 'pool', None):
+            conn.close_pool()
+        conn.close()
+        del connections.settings[alias]
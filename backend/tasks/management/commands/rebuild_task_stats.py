@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las estadísticas desnormalizadas (TaskStats y los contadores "
+        "de subtareas de Task). Con --verify solo compara y falla si hay diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='No modifica nada: solo informa las diferencias (exit code 1 si las hay).',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            problems = stats.verify_stats()
+            for problem in problems:
+                self.stderr.write(problem)
+            if problems:
+                raise CommandError(f"{len(problems)} contadores no coinciden.")
+            self.stdout.write(self.style.SUCCESS("Estadísticas consistentes."))
+            return
+
+        stats.rebuild_user_stats()
+        stats.rebuild_task_counters()
+        self.stdout.write(self.style.SUCCESS("Estadísticas reconstruidas."))
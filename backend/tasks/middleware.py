@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware con umbral configurable (settings.GZIP_MIN_LENGTH, en bytes).
+
+    - Las respuestas chicas no se comprimen: el ahorro no compensa la CPU.
+    - El stream SSE (text/event-stream) nunca se comprime: gzip acumula datos
+      antes de emitirlos y los eventos dejarían de llegar en vivo.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            if response.get('Content-Type', '').startswith('text/event-stream'):
+                return response
+        elif len(response.content) < getattr(settings, 'GZIP_MIN_LENGTH', 200):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,69 @@
+# Denormalized stats: TaskStats table + subtask counters on Task
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_stats(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskStats = apps.get_model('tasks', 'TaskStats')
+
+    rows = (
+        Task.objects.order_by()
+        .values('user_id', 'category_id')
+        .annotate(total=Count('id'), done=Count('id', filter=Q(completed=True)))
+    )
+    TaskStats.objects.bulk_create([
+        TaskStats(user_id=r['user_id'], category_id=r['category_id'], total=r['total'], completed=r['done'])
+        for r in rows
+    ])
+
+    counters = Task.objects.annotate(
+        n=Count('subtasks'), done=Count('subtasks', filter=Q(subtasks__completed=True))
+    ).filter(n__gt=0).values_list('pk', 'n', 'done')
+    for pk, n, done in counters:
+        Task.objects.filter(pk=pk).update(subtask_count=n, subtasks_completed=done)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_subtask_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='subtask_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtasks_completed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed', 'due_date'], name='task_user_overdue_idx'),
+        ),
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='tasks.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'category'), name='taskstats_user_category_uniq'),
+                    models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user',), name='taskstats_user_nocategory_uniq'),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
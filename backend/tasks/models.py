@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User # Importamos el modelo de Usuario que ya viene en Django
 from .ai_service import suggest_category
 from rest_framework.decorators import action
+from . import stats
 
 # Tabla Category (Categorías de tareas)
 class Category(models.Model):
@@ -15,6 +19,48 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+# QuerySet de Task: bulk_create() y update() no disparan signals, así que
+# después de ejecutarlos recalculamos las estadísticas de los usuarios afectados.
+# (bulk_update() termina llamando a update(), así que queda cubierto.)
+# También mantienen completed_at igual que Task.save().
+class TaskQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        for obj in objs:
+            obj.sync_completed_at()
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            stats.rebuild_user_stats({obj.user_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        if 'completed' in fields and 'completed_at' not in fields:
+            for obj in objs:
+                obj.sync_completed_at()
+            fields.append('completed_at')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        # Solo con un valor fijo sabemos qué poner; con una expresión (ej. el
+        # Case de bulk_update) completed_at ya viene resuelto desde arriba.
+        if isinstance(kwargs.get('completed'), bool) and 'completed_at' not in kwargs:
+            kwargs['completed_at'] = (
+                Coalesce(F('completed_at'), Value(timezone.now())) if kwargs['completed'] else None
+            )
+        if not stats.TASK_STATS_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        before = list(self.values_list('pk', 'user_id'))
+        user_ids = {user_id for _, user_id in before}
+        rows = super().update(**kwargs)
+        if {'user', 'user_id'}.intersection(kwargs):
+            # El valor nuevo puede ser una expresión (ej. el Case de bulk_update)
+            user_ids.update(
+                self.model.objects.filter(pk__in=[pk for pk, _ in before]).values_list('user_id', flat=True)
+            )
+        stats.rebuild_user_stats(user_ids)
+        return rows
+
+
 # Tabla Task (Tareas)
 class Task(models.Model):
     # Opciones para el estado (aunque usamos BooleanField, esto es útil para documentación)
@@ -49,11 +95,87 @@ class Task(models.Model):
     # Fecha límite / recordatorio (para usar como agenda)
     due_date = models.DateField(null=True, blank=True)
 
+    # Cuándo se marcó como completada (NULL si está pendiente). Lo mantiene
+    # save() / el QuerySet; es lo que usa el archivado (tasks/archive.py).
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Contadores desnormalizados de subtareas (los mantienen los signals de Subtask)
+    subtask_count = models.PositiveIntegerField(default=0, editable=False)
+    subtasks_completed = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('subtask_count', 'subtasks_completed')
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Para contar tareas vencidas sin recorrer toda la tabla
+            models.Index(fields=['user', 'completed', 'due_date'], name='task_user_overdue_idx'),
+            # Para buscar las completadas hace más de N días (archive_tasks)
+            models.Index(fields=['completed', 'completed_at'], name='task_completed_at_idx'),
+        ]
+
+    # Guardamos los valores leídos de la DB para que los signals puedan
+    # calcular el delta de estadísticas al guardar.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def sync_completed_at(self):
+        if not self.completed:
+            self.completed_at = None
+        elif self.completed_at is None:
+            self.completed_at = timezone.now()
+
+    def save(self, *args, **kwargs):
+        self.sync_completed_at()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'completed' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
+        super().save(*args, **kwargs)
+
+    # Los contadores se actualizan con UPDATE ... F() desde los signals, así que
+    # el UPDATE de save() no los incluye: pisaría un incremento concurrente con
+    # el valor (posiblemente viejo) de esta instancia.
+    def _do_update(self, base_qs, using, pk_val, values, *args, **kwargs):
+        values = [value for value in values if value[0].attname not in self.COUNTER_FIELDS]
+        updated = super()._do_update(base_qs, using, pk_val, values, *args, **kwargs)
+        if not updated:
+            # La fila ya no existe (ni sus subtareas): save() la vuelve a
+            # insertar como siempre, con los contadores en cero.
+            self.subtask_count = self.subtasks_completed = 0
+        return updated
+
     # Representación: "Comprar pan (juanperez)"
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
 
+# QuerySet de Subtask: igual que TaskQuerySet, pero recalcula los contadores
+# de subtareas de las tareas afectadas.
+class SubtaskQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            stats.rebuild_task_counters({obj.task_id for obj in objs})
+        return objs
+
+    def update(self, **kwargs):
+        if not stats.SUBTASK_COUNTER_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        before = list(self.values_list('pk', 'task_id'))
+        task_ids = {task_id for _, task_id in before}
+        rows = super().update(**kwargs)
+        if {'task', 'task_id'}.intersection(kwargs):
+            task_ids.update(
+                self.model.objects.filter(pk__in=[pk for pk, _ in before]).values_list('task_id', flat=True)
+            )
+        stats.rebuild_task_counters(task_ids)
+        return rows
+
+
 # Subtareas (relacionadas 1 N con Task)
 class Subtask(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='subtasks')
@@ -66,9 +188,93 @@ class Subtask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     due_date = models.DateField(null=True, blank=True)
 
+    objects = SubtaskQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"{self.title} (subtask de {self.task_id})"
 
+
+# Tabla TaskStats (resumen desnormalizado por usuario y categoría)
+# Una fila por (usuario, categoría); category NULL = tareas sin categoría.
+class TaskStats(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_stats')
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name='task_stats'
+    )
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    # Tareas de (usuario, categoría) movidas a ArchivedTask (todas completadas).
+    # total/completed cuentan solo las activas; el resumen suma las dos cosas.
+    archived = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category'],
+                condition=models.Q(category__isnull=False),
+                name='taskstats_user_category_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(category__isnull=True),
+                name='taskstats_user_nocategory_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Stats of {self.user_id} / {self.category_id}: {self.completed}/{self.total}"
+
+# Tablas de archivo (tareas completadas viejas, ver tasks/archive.py)
+# Mismas columnas que Task/Subtask, pero fuera de las tablas "calientes":
+# las consultas habituales no recorren estas filas. Conservan el id original.
+class ArchivedTask(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    completed = models.BooleanField(default=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_tasks')
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_tasks'
+    )
+    ai_classification = models.CharField(max_length=50, blank=True, null=True)
+    created_at = models.DateTimeField()
+    due_date = models.DateField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    subtask_count = models.PositiveIntegerField(default=0)
+    subtasks_completed = models.PositiveIntegerField(default=0)
+    # Cuándo se movió al archivo
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archivedtask_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.user_id}, archivada)"
+
+
+class ArchivedSubtask(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(ArchivedTask, on_delete=models.CASCADE, related_name='subtasks')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    completed = models.BooleanField(default=False)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_subtasks'
+    )
+    created_at = models.DateTimeField()
+    due_date = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.title} (subtask archivada de {self.task_id})"
+
 # ... (imports)
 
 # Tabla Profile (Perfiles de usuario)
@@ -0,0 +1,32 @@
+"""
+Renderers JSON de la API.
+
+`FastJSONRenderer` usa orjson (bastante más rápido que el módulo json de la
+librería estándar) si está instalado; si no, se comporta igual que el
+JSONRenderer de DRF. Se elige por vista con `renderer_classes`.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Con indentación (ej. la API navegable) usamos el renderer de DRF:
+        # orjson solo sabe indentar a 2 espacios.
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # OPT_UTC_Z: fechas UTC con "Z" final, igual que los DateTimeField de DRF.
+        # Lo que orjson no conoce (lazy strings, etc.) lo resuelve el encoder de DRF.
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
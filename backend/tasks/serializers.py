@@ -1,6 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Task, Category, Profile, Subtask
+from .models import Task, Category, Profile, Subtask, ArchivedTask, ArchivedSubtask
+
+# 0. Base: permite pedir solo algunos campos con Serializer(..., fields=[...])
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            # Quitamos los campos no pedidos (así ni se calculan al serializar)
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 # 1. Serializer para Perfil (para mostrar avatar/rol junto al usuario)
 class ProfileSerializer(serializers.ModelSerializer):
@@ -33,18 +43,49 @@ class SubtaskSerializer(serializers.ModelSerializer):
 
 
 # 5. Serializer para Tarea
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(DynamicFieldsModelSerializer):
     user_username = serializers.ReadOnlyField(source='user.username')
     category_name = serializers.ReadOnlyField(source='category.name')
     subtasks = SubtaskSerializer(many=True, read_only=True)
 
+    # Modo compacto de la lista (?compact=true): lo justo para títulos y checkboxes.
+    # Los contadores de subtareas reemplazan a embeber las subtareas.
+    COMPACT_FIELDS = ['id', 'title', 'completed', 'category', 'due_date', 'subtask_count', 'subtasks_completed']
+    # Relaciones que se pueden pedir con ?expand=
+    EXPANDABLE_FIELDS = ['subtasks']
+    # Campos que salen de otra tabla: nombre del campo -> FK a traer con select_related
+    RELATED_FIELDS = {'user_username': 'user', 'category_name': 'category'}
+
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'completed',
             'user', 'user_username',
             'category', 'category_name',
-            'ai_classification', 'created_at', 'due_date',
-            'subtasks',
+            'ai_classification', 'created_at', 'due_date', 'completed_at',
+            'subtasks', 'subtask_count', 'subtasks_completed',
         ]
-        read_only_fields = ['user', 'ai_classification', 'created_at']
\ No newline at end of file
+        read_only_fields = [
+            'user', 'ai_classification', 'created_at', 'completed_at', 'subtask_count', 'subtasks_completed',
+        ]
+
+
+# 6. Serializers de solo lectura para el archivo (mismos campos que Task/Subtask + archived_at)
+class ArchivedSubtaskSerializer(serializers.ModelSerializer):
+    category_name = serializers.ReadOnlyField(source='category.name')
+
+    class Meta:
+        model = ArchivedSubtask
+        fields = ['id', 'title', 'description', 'completed', 'category', 'category_name', 'due_date', 'created_at']
+        read_only_fields = fields
+
+
+class ArchivedTaskSerializer(DynamicFieldsModelSerializer):
+    user_username = serializers.ReadOnlyField(source='user.username')
+    category_name = serializers.ReadOnlyField(source='category.name')
+    subtasks = ArchivedSubtaskSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedTask
+        fields = TaskSerializer.Meta.fields + ['archived_at']
+        read_only_fields = fields
@@ -0,0 +1,172 @@
+"""
+Signals que mantienen al día las estadísticas desnormalizadas (ver tasks/stats.py).
+
+Cada save/delete de Task o Subtask aplica solo el delta que corresponde,
+comparando con los valores que la instancia tenía al leerse de la DB
+(`_loaded_values`, guardado en Model.from_db). Si no tenemos esos valores
+(instancia armada a mano), recalculamos al dueño afectado desde cero.
+
+Además publican los eventos en vivo para GET /api/events/ (ver tasks/events.py).
+
+Dentro de `muted()` los receivers de Task/Subtask no hacen nada: lo usa quien
+borra o modifica en bloque y recalcula/publica por su cuenta (ej. tasks/archive.py).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import events, stats
+from .models import Category, Subtask, Task, TaskStats
+
+
+# ContextVar y no disconnect(): solo afecta al hilo/tarea actual, las demás
+# peticiones del proceso siguen actualizando las estadísticas.
+_muted = ContextVar('tasks_signals_muted', default=False)
+
+
+@contextmanager
+def muted():
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def _remember(instance, *fields):
+    instance._loaded_values = {f: getattr(instance, f) for f in fields}
+
+
+# Payloads livianos (sin consultas extra): el cliente actualiza la fila
+# correspondiente o pide el detalle si necesita más.
+def _task_payload(task):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'completed': task.completed,
+        'category': task.category_id,
+        'due_date': task.due_date,
+    }
+
+
+def _subtask_payload(subtask):
+    return {
+        'id': subtask.pk,
+        'task': subtask.task_id,
+        'title': subtask.title,
+        'completed': subtask.completed,
+        'category': subtask.category_id,
+        'due_date': subtask.due_date,
+    }
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _muted.get():
+        return
+    new_key = (instance.user_id, instance.category_id)
+    done = int(bool(instance.completed))
+
+    if created:
+        stats.apply_task_delta(*new_key, total=1, completed=done)
+    else:
+        old = getattr(instance, '_loaded_values', None)
+        if old is None or not {'user_id', 'category_id', 'completed'} <= old.keys():
+            stats.rebuild_user_stats({instance.user_id})
+        else:
+            old_key = (old['user_id'], old['category_id'])
+            old_done = int(bool(old['completed']))
+            if old_key != new_key:
+                stats.apply_task_delta(*old_key, total=-1, completed=-old_done)
+                stats.apply_task_delta(*new_key, total=1, completed=done)
+            elif old_done != done:
+                stats.apply_task_delta(*new_key, completed=done - old_done)
+
+    _remember(instance, 'user_id', 'category_id', 'completed')
+    events.publish(
+        instance.user_id,
+        'task.created' if created else 'task.updated',
+        lambda: _task_payload(instance),
+    )
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    stats.apply_task_delta(
+        instance.user_id, instance.category_id,
+        total=-1, completed=-int(bool(instance.completed)),
+    )
+    events.publish(instance.user_id, 'task.deleted', {'id': instance.pk})
+
+
+@receiver(post_save, sender=Subtask)
+def subtask_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _muted.get():
+        return
+    done = int(bool(instance.completed))
+
+    if created:
+        stats.apply_subtask_delta(instance.task_id, count=1, completed=done)
+    else:
+        old = getattr(instance, '_loaded_values', None)
+        if old is None or not {'task_id', 'completed'} <= old.keys():
+            stats.rebuild_task_counters({instance.task_id})
+        else:
+            old_done = int(bool(old['completed']))
+            if old['task_id'] != instance.task_id:
+                stats.apply_subtask_delta(old['task_id'], count=-1, completed=-old_done)
+                stats.apply_subtask_delta(instance.task_id, count=1, completed=done)
+            elif old_done != done:
+                stats.apply_subtask_delta(instance.task_id, completed=done - old_done)
+
+    _remember(instance, 'task_id', 'completed')
+    events.publish(
+        _owner_id(instance),
+        'subtask.created' if created else 'subtask.updated',
+        lambda: _subtask_payload(instance),
+    )
+
+
+@receiver(post_delete, sender=Subtask)
+def subtask_deleted(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    stats.apply_subtask_delta(
+        instance.task_id, count=-1, completed=-int(bool(instance.completed))
+    )
+    events.publish(
+        _owner_id(instance), 'subtask.deleted', {'id': instance.pk, 'task': instance.task_id}
+    )
+
+
+def _owner_id(subtask):
+    # Si la tarea ya está cacheada (caso habitual en las vistas) no hay consulta extra
+    if Subtask._meta.get_field('task').is_cached(subtask):
+        return subtask.task.user_id
+    # Sin ninguna conexión abierta no vale la pena buscar al dueño:
+    # publish(None, ...) no hace nada.
+    if not events.get_broker().has_any_subscribers():
+        return None
+    return Task.objects.filter(pk=subtask.task_id).values_list('user_id', flat=True).first()
+
+
+# Al borrar una categoría, sus tareas pasan a category=NULL con un UPDATE
+# (SET_NULL) que no dispara signals. Anotamos los usuarios afectados antes
+# del borrado y los recalculamos después.
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    instance._stats_user_ids = set(
+        TaskStats.objects.filter(category=instance).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_stats_user_ids', None)
+    if user_ids:
+        stats.rebuild_user_stats(user_ids)
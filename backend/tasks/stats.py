@@ -0,0 +1,208 @@
+"""
+Estadísticas desnormalizadas de tareas.
+
+En lugar de recorrer todas las filas de `tasks_task` cada vez que el frontend
+pide un resumen, mantenemos dos tipos de contadores:
+
+- `TaskStats`: una fila por (usuario, categoría) con `total` y `completed` de
+  las tareas activas, y `archived` con las que ya pasaron a ArchivedTask.
+- `Task.subtask_count` / `Task.subtasks_completed`: contadores por tarea.
+
+Los signals (tasks/signals.py) aplican deltas incrementales con UPDATE ... F(),
+y las funciones `rebuild_*` recalculan desde cero (usadas por bulk_create,
+QuerySet.update / bulk_update y el comando `rebuild_task_stats`).
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+
+# Campos de Task / Subtask que, si cambian, alteran los contadores
+TASK_STATS_FIELDS = {'user', 'user_id', 'category', 'category_id', 'completed'}
+SUBTASK_COUNTER_FIELDS = {'task', 'task_id', 'completed'}
+
+
+def apply_task_delta(user_id, category_id, total=0, completed=0):
+    """Suma (o resta) `total`/`completed` a la fila (user, category) de TaskStats."""
+    from .models import TaskStats
+
+    if not total and not completed:
+        return
+    updated = TaskStats.objects.filter(user_id=user_id, category_id=category_id).update(
+        total=F('total') + total,
+        completed=F('completed') + completed,
+    )
+    # Solo creamos la fila al sumar: al restar (ej. borrado en cascada del
+    # usuario) la fila puede no existir ya y no queremos resucitarla.
+    if updated or total < 0 or completed < 0:
+        return
+    try:
+        with transaction.atomic():
+            TaskStats.objects.create(
+                user_id=user_id, category_id=category_id, total=total, completed=completed
+            )
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT
+        TaskStats.objects.filter(user_id=user_id, category_id=category_id).update(
+            total=F('total') + total,
+            completed=F('completed') + completed,
+        )
+
+
+def apply_subtask_delta(task_id, count=0, completed=0):
+    """Suma (o resta) a los contadores de subtareas de una tarea."""
+    from .models import Task
+
+    if not count and not completed:
+        return
+    Task.objects.filter(pk=task_id).update(
+        subtask_count=F('subtask_count') + count,
+        subtasks_completed=F('subtasks_completed') + completed,
+    )
+
+
+def compute_user_stats(user_ids=None):
+    """
+    Calcula desde `tasks_task` y `tasks_archivedtask` los valores que deberían
+    tener las filas de TaskStats.
+    Devuelve {(user_id, category_id): (total, completed, archived)}.
+    """
+    from .models import ArchivedTask, Task
+
+    qs = Task.objects.all()
+    archived_qs = ArchivedTask.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+        archived_qs = archived_qs.filter(user_id__in=user_ids)
+    rows = (
+        qs.order_by()
+        .values('user_id', 'category_id')
+        .annotate(total=Count('id'), done=Count('id', filter=Q(completed=True)))
+    )
+    result = {(r['user_id'], r['category_id']): (r['total'], r['done'], 0) for r in rows}
+
+    archived_rows = (
+        archived_qs.order_by()
+        .values('user_id', 'category_id')
+        .annotate(n=Count('id'))
+    )
+    for r in archived_rows:
+        key = (r['user_id'], r['category_id'])
+        total, done, _ = result.get(key, (0, 0, 0))
+        result[key] = (total, done, r['n'])
+    return result
+
+
+def rebuild_user_stats(user_ids=None):
+    """Reconstruye las filas de TaskStats (de los usuarios indicados o de todos)."""
+    from .models import TaskStats
+
+    expected = compute_user_stats(user_ids)
+    with transaction.atomic():
+        existing = TaskStats.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        TaskStats.objects.bulk_create([
+            TaskStats(
+                user_id=user_id, category_id=category_id,
+                total=total, completed=done, archived=archived,
+            )
+            for (user_id, category_id), (total, done, archived) in expected.items()
+        ])
+
+
+def compute_subtask_counters(task_ids=None):
+    """Devuelve {task_id: (subtask_count, subtasks_completed)} calculado desde `tasks_subtask`."""
+    from .models import Task
+
+    qs = Task.objects.all()
+    if task_ids is not None:
+        qs = qs.filter(pk__in=task_ids)
+    rows = qs.order_by().annotate(
+        n=Count('subtasks'),
+        done=Count('subtasks', filter=Q(subtasks__completed=True)),
+    ).values_list('pk', 'n', 'done')
+    return {pk: (n, done) for pk, n, done in rows}
+
+
+def rebuild_task_counters(task_ids=None):
+    """Reescribe subtask_count / subtasks_completed de las tareas indicadas (o de todas)."""
+    from .models import Task
+
+    expected = compute_subtask_counters(task_ids)
+    with transaction.atomic():
+        for pk, (n, done) in expected.items():
+            Task.objects.filter(pk=pk).update(subtask_count=n, subtasks_completed=done)
+
+
+def verify_stats():
+    """
+    Compara los contadores guardados con los reales.
+    Devuelve una lista de strings describiendo cada diferencia (vacía si todo cuadra).
+    """
+    from .models import Task, TaskStats
+
+    problems = []
+
+    expected = compute_user_stats()
+    stored = {
+        (s.user_id, s.category_id): (s.total, s.completed, s.archived)
+        for s in TaskStats.objects.all()
+    }
+    for key in sorted(set(expected) | set(stored), key=str):
+        want = expected.get(key, (0, 0, 0))
+        got = stored.get(key, (0, 0, 0))
+        if want != got:
+            problems.append(
+                f"TaskStats user={key[0]} category={key[1]}: guardado {got}, real {want}"
+            )
+
+    counters = compute_subtask_counters()
+    for pk, n, done in Task.objects.values_list('pk', 'subtask_count', 'subtasks_completed'):
+        want = counters.get(pk, (0, 0))
+        if (n, done) != want:
+            problems.append(f"Task {pk}: guardado {(n, done)}, real {want}")
+
+    return problems
+
+
+def get_user_stats(user):
+    """
+    Resumen para el endpoint GET /api/tasks/stats/.
+    total/completed/by_category salen de TaskStats (pocas filas por usuario)
+    e incluyen las tareas archivadas, que siempre están completadas; overdue depende de la fecha de hoy, así que se cuenta con el índice
+    (user, completed, due_date) de Task.
+    """
+    from .models import Task, TaskStats
+
+    rows = list(
+        TaskStats.objects.filter(user=user)
+        .select_related('category')
+        .order_by(F('category__name').asc(nulls_first=True))
+    )
+    total = sum(r.total + r.archived for r in rows)
+    completed = sum(r.completed + r.archived for r in rows)
+    overdue = Task.objects.filter(
+        user=user, completed=False, due_date__lt=timezone.localdate()
+    ).count()
+
+    return {
+        'total': total,
+        'completed': completed,
+        'pending': total - completed,
+        'overdue': overdue,
+        'archived': sum(r.archived for r in rows),
+        'by_category': [
+            {
+                'category': r.category_id,
+                'category_name': r.category.name if r.category else None,
+                'total': r.total + r.archived,
+                'completed': r.completed + r.archived,
+                'archived': r.archived,
+            }
+            for r in rows
+            if r.total or r.archived
+        ],
+    }
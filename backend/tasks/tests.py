@@ -14,10 +14,32 @@ Ejecución:
   docker compose exec backend python manage.py test tasks
 """
 
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from io import StringIO
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Task
+from . import ai_service, archive, events, stats
+from .models import Task, Category, Subtask, TaskStats, ArchivedTask
+from .renderers import FastJSONRenderer
+from .views import TaskViewSet
+from .serializers import TaskSerializer
 
 
 class TaskViewSetTests(APITestCase):
@@ -48,3 +70,621 @@ class TaskViewSetTests(APITestCase):
         task = Task.objects.get(pk=response.data["id"])
         self.assertEqual(task.user_id, self.user.id)
         self.assertEqual(task.title, "Mi primera tarea")
+
+
+class TaskStatsTests(APITestCase):
+    """Pruebas de las estadísticas desnormalizadas (TaskStats y contadores de subtareas)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="statsuser", password="testpass123")
+        self.work = Category.objects.create(name="Trabajo")
+        self.client.force_authenticate(user=self.user)
+
+    def test_counters_follow_save_and_delete(self):
+        """Crear, completar, recategorizar y borrar tareas/subtareas ajusta los contadores."""
+        task = Task.objects.create(title="A", user=self.user, category=self.work)
+        Task.objects.create(title="B", user=self.user)
+        sub = Subtask.objects.create(task=task, title="paso 1")
+        Subtask.objects.create(task=task, title="paso 2", completed=True)
+
+        task = Task.objects.get(pk=task.pk)
+        task.completed = True
+        task.category = None
+        task.save()
+        sub.completed = True
+        sub.save()
+
+        task.refresh_from_db()
+        self.assertEqual((task.subtask_count, task.subtasks_completed), (2, 2))
+        row = TaskStats.objects.get(user=self.user, category=None)
+        self.assertEqual((row.total, row.completed), (2, 1))
+        self.assertEqual(TaskStats.objects.get(user=self.user, category=self.work).total, 0)
+
+        sub.delete()
+        Task.objects.get(title="B").delete()
+        task.refresh_from_db()
+        self.assertEqual((task.subtask_count, task.subtasks_completed), (1, 1))
+        self.assertEqual(stats_row(self.user, None), (1, 1))
+
+    def test_bulk_update_and_category_delete_keep_stats_consistent(self):
+        tasks = [Task.objects.create(title=f"T{i}", user=self.user, category=self.work) for i in range(3)]
+        subs = [Subtask.objects.create(task=tasks[0], title=f"S{i}") for i in range(2)]
+        for t in tasks:
+            t.completed = True
+        Task.objects.bulk_update(tasks, ['completed'])
+        for s in subs:
+            s.completed = True
+        Subtask.objects.bulk_update(subs, ['completed'])
+
+        self.assertEqual(stats_row(self.user, self.work), (3, 3))
+        self.assertEqual(Task.objects.get(pk=tasks[0].pk).subtasks_completed, 2)
+
+        self.work.delete()
+        self.assertEqual(stats_row(self.user, None), (3, 3))
+        call_command("rebuild_task_stats", "--verify", stdout=StringIO())
+
+    def test_bulk_update_rebuilds_once(self):
+        tasks = [Task.objects.create(title=f"T{i}", user=self.user) for i in range(2)]
+        for t in tasks:
+            t.completed = True
+        with mock.patch.object(stats, "rebuild_user_stats", wraps=stats.rebuild_user_stats) as rebuild:
+            Task.objects.bulk_update(tasks, ["completed"])
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(stats_row(self.user, None), (2, 2))
+
+    def test_bulk_create_keeps_stats_consistent(self):
+        task = Task.objects.create(title="A", user=self.user)
+        new_tasks = Task.objects.bulk_create([Task(title=f"B{i}", user=self.user) for i in range(3)])
+        Subtask.objects.bulk_create([Subtask(task=new_tasks[0], title="x") for _ in range(2)])
+        self.assertEqual(stats_row(self.user, None), (4, 0))
+        self.assertEqual(Task.objects.get(pk=new_tasks[0].pk).subtask_count, 2)
+        self.assertEqual(stats.verify_stats(), [])
+        self.assertEqual(task.subtask_count, 0)
+
+    def test_save_keeps_counters_and_reinserts_deleted_rows(self):
+        task = Task.objects.get(pk=Task.objects.create(title="A", user=self.user).pk)
+        Subtask.objects.create(task_id=task.pk, title="paso")
+        task.title = "A editada"
+        with CaptureQueriesContext(connection) as ctx:
+            task.save()  # la instancia tiene subtask_count=0 en memoria
+        # Un solo UPDATE, sin releer la fila ni tocar los contadores
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("subtask_count", ctx.captured_queries[0]["sql"])
+        self.assertEqual(Task.objects.get(pk=task.pk).subtask_count, 1)
+
+        Task.objects.filter(pk=task.pk).delete()
+        task.save()  # como en Django: si la fila no existe, se vuelve a insertar
+        self.assertEqual(Task.objects.get(pk=task.pk).subtask_count, 0)
+
+    def test_verify_detects_drift_and_rebuild_fixes_it(self):
+        Task.objects.create(title="A", user=self.user)
+        TaskStats.objects.filter(user=self.user).update(total=10)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_task_stats", "--verify", stdout=StringIO(), stderr=StringIO())
+        call_command("rebuild_task_stats", stdout=StringIO())
+        self.assertEqual(stats_row(self.user, None), (1, 0))
+
+    def test_stats_endpoint(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        Task.objects.create(title="Vencida", user=self.user, category=self.work, due_date=yesterday)
+        Task.objects.create(title="Hecha", user=self.user, completed=True, due_date=yesterday)
+        Task.objects.create(title="Ajena", user=User.objects.create_user(username="otro"))
+
+        response = self.client.get("/api/tasks/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 2)
+        self.assertEqual(response.data["completed"], 1)
+        self.assertEqual(response.data["overdue"], 1)
+        self.assertEqual(
+            [(c["category_name"], c["total"]) for c in response.data["by_category"]],
+            [(None, 1), ("Trabajo", 1)],
+        )
+
+
+@override_settings(EVENTS_BROKER="tasks.tests.RecordingBroker")
+class CategorizeUnavailableTests(APITestCase):
+    """Con la IA caída, categorize responde 503 sin tocar la tarea."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.user = User.objects.create_user(username="aiuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        Category.objects.create(name="General")
+
+    def test_open_breaker_returns_503_and_keeps_task(self):
+        task = Task.objects.create(title="Informe", user=self.user)
+        breaker = ai_service.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        with mock.patch.object(ai_service, "llm_guard", ai_service.LLMGuard(breaker=breaker)):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f"/api/tasks/{task.pk}/categorize/")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIsNone(Task.objects.get(pk=task.pk).category_id)
+        self.assertEqual(events.get_broker().published, [])
+
+
+class RecordingBroker(events.Broker):
+    """Broker de prueba: guarda lo publicado en lugar de repartirlo."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, user_id, event):
+        self.published.append((user_id, event["type"], event["data"]))
+
+
+@override_settings(EVENTS_BROKER="tasks.tests.RecordingBroker")
+class EventPublishingTests(APITestCase):
+    """Los cambios de tareas/subtareas publican eventos para el dueño."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.user = User.objects.create_user(username="eventuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def test_task_and_subtask_changes_are_published_after_commit(self):
+        broker = events.get_broker()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/tasks/", {"title": "Nueva"}, format="json")
+        task_id = response.data["id"]
+        with self.captureOnCommitCallbacks(execute=True):
+            sub = self.client.post("/api/subtasks/", {"task": task_id, "title": "Paso"}, format="json")
+            self.client.patch(f"/api/subtasks/{sub.data['id']}/", {"completed": True}, format="json")
+            self.client.delete(f"/api/tasks/{task_id}/")
+
+        self.assertEqual(
+            [(user_id, event_type) for user_id, event_type, _ in broker.published],
+            [
+                (self.user.pk, "task.created"),
+                (self.user.pk, "subtask.created"),
+                (self.user.pk, "subtask.updated"),
+                (self.user.pk, "subtask.deleted"),
+                (self.user.pk, "task.deleted"),
+            ],
+        )
+        self.assertEqual(broker.published[2][2]["completed"], True)
+
+
+@override_settings(EVENTS_BROKER="tasks.events.InProcessBroker")
+class EventOwnerLookupTests(APITestCase):
+    """Sin conexiones abiertas, guardar subtareas no consulta al dueño de la tarea."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.user = User.objects.create_user(username="owneruser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title="A", user=self.user)
+        self.subtask = Subtask.objects.create(task=self.task, title="paso")
+
+    def owner_lookups(self, queries):
+        return [q["sql"] for q in queries if q["sql"].startswith('SELECT "tasks_task"."user_id"')]
+
+    def test_api_save_and_delete_skip_owner_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(f"/api/subtasks/{self.subtask.pk}/", {"completed": True}, format="json")
+            self.client.delete(f"/api/subtasks/{self.subtask.pk}/")
+        self.assertEqual(self.owner_lookups(ctx.captured_queries), [])
+
+    def test_uncached_task_is_looked_up_only_with_listeners(self):
+        subtask = Subtask.objects.get(pk=self.subtask.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            subtask.save()
+        self.assertEqual(self.owner_lookups(ctx.captured_queries), [])
+
+
+@override_settings(EVENTS_BROKER="tasks.events.InProcessBroker")
+class EventStreamTests(APITestCase):
+    """GET /api/events/ (SSE) entrega los eventos del usuario autenticado."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.user = User.objects.create_user(username="streamuser", password="testpass123")
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get("/api/events/")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_delivers_published_events(self):
+        response = await self.async_client.get(f"/api/events/?token={self.token.key}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+
+        broker = events.get_broker()
+        self.assertTrue(broker.has_subscribers(self.user.pk))
+        # Se publica desde otro hilo, como lo haría una vista sync
+        await sync_to_async(broker.publish)(self.user.pk, {"type": "task.updated", "data": {"id": 7}})
+        broker.publish(self.user.pk + 1, {"type": "task.updated", "data": {"id": 8}})
+
+        chunk = await anext(stream)
+        self.assertEqual(chunk, b'event: task.updated\ndata: {"id": 7}\n\n')
+        await stream.aclose()
+
+
+class TaskSparseFieldsTests(APITestCase):
+    """?fields=, ?expand= y ?compact= en GET /api/tasks/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="fieldsuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        work = Category.objects.create(name="Trabajo")
+        for i in range(3):
+            task = Task.objects.create(title=f"T{i}", user=self.user, category=work)
+            Subtask.objects.create(task=task, title="paso", category=work)
+
+    def test_default_list_is_full_and_avoids_n_plus_one(self):
+        # 1 consulta de tareas (con JOIN) + 1 de subtareas, sin importar cuántas tareas haya
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/tasks/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["category_name"], "Trabajo")
+        self.assertEqual(response.data[0]["subtasks"][0]["category_name"], "Trabajo")
+
+    def test_compact_list_has_no_subtasks(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/tasks/?compact=true")
+        self.assertEqual(set(response.data[0]), set(TaskSerializer.COMPACT_FIELDS))
+        self.assertEqual(response.data[0]["subtask_count"], 1)
+
+    def test_fields_and_expand(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/tasks/?fields=id,title,category_name&expand=subtasks")
+        self.assertEqual(set(response.data[0]), {"id", "title", "category_name", "subtasks"})
+        self.assertEqual(response.data[0]["category_name"], "Trabajo")
+        self.assertEqual(len(response.data[0]["subtasks"]), 1)
+
+    @override_settings(TIME_ZONE="America/Argentina/Buenos_Aires")
+    def test_values_path_matches_serializer_time_zone(self):
+        Task.objects.update(completed=True)
+        url = "/api/tasks/?fields=id,created_at,completed_at"
+        fast = self.client.get(url).json()
+        with mock.patch.object(TaskViewSet, "values_fast_path", False):
+            slow = self.client.get(url).json()
+        self.assertEqual(fast, slow)
+        self.assertTrue(fast[0]["created_at"].endswith("-03:00"))
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/tasks/?fields=id,password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/tasks/?expand=user")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastRenderingTests(APITestCase):
+    """Camino rápido (.values() + FastJSONRenderer) y compresión gzip."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="fastuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        work = Category.objects.create(name="Trabajo")
+        for i in range(40):
+            Task.objects.create(
+                title=f"Tarea {i}", user=self.user, category=work if i % 2 else None,
+                due_date=timezone.localdate(), description="x" * 30,
+            )
+
+    def test_values_path_matches_serializer_output(self):
+        fields = ["id", "title", "user", "user_username", "category_name", "created_at", "due_date"]
+        response = self.client.get(f"/api/tasks/?fields={','.join(fields)}")
+        tasks = Task.objects.filter(user=self.user).order_by("-created_at")
+        expected = JSONRenderer().render(TaskSerializer(tasks, many=True, fields=fields).data)
+        self.assertEqual(response.json(), json.loads(expected))
+
+    def test_indent_request_falls_back_to_drf_renderer(self):
+        data = {"id": 1, "title": "A"}
+        rendered = FastJSONRenderer().render(data, "application/json; indent=4", {})
+        self.assertEqual(rendered, JSONRenderer().render(data, "application/json; indent=4", {}))
+        self.assertIn(b'\n    "id"', rendered)
+
+    def test_large_responses_are_gzipped(self):
+        response = self.client.get("/api/tasks/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        # Respuestas chicas quedan sin comprimir
+        response = self.client.get("/api/tasks/stats/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+@override_settings(EVENTS_BROKER="tasks.tests.RecordingBroker")
+class TaskArchiveTests(APITestCase):
+    """Comando archive_tasks y acceso a las tareas archivadas."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.user = User.objects.create_user(username="archiveuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.old = timezone.now() - timedelta(days=100)
+        self.old_done = [
+            Task.objects.create(title=f"Informe viejo {i}", user=self.user, completed=True)
+            for i in range(3)
+        ]
+        Task.objects.filter(pk__in=[t.pk for t in self.old_done]).update(
+            created_at=self.old, completed_at=self.old
+        )
+        Subtask.objects.create(task=self.old_done[0], title="paso archivado", completed=True)
+        self.old_pending = Task.objects.create(title="Pendiente vieja", user=self.user)
+        # Creada hace mucho pero completada hoy: todavía no se archiva
+        self.done_today = Task.objects.create(title="Completada hoy", user=self.user)
+        Task.objects.filter(pk__in=[self.old_pending.pk, self.done_today.pk]).update(created_at=self.old)
+        self.done_today.refresh_from_db()
+        self.done_today.completed = True
+        self.done_today.save()
+        self.recent_done = Task.objects.create(title="Informe reciente", user=self.user, completed=True)
+
+    def test_completed_at_follows_completed(self):
+        task = Task.objects.create(title="A", user=self.user)
+        self.assertIsNone(task.completed_at)
+        task.completed = True
+        task.save(update_fields=["completed"])
+        task.refresh_from_db()
+        first = task.completed_at
+        self.assertIsNotNone(first)
+        Task.objects.filter(pk=task.pk).update(completed=True)  # ya estaba: se conserva
+        self.assertEqual(Task.objects.get(pk=task.pk).completed_at, first)
+
+        Task.objects.filter(pk=task.pk).update(completed=False)
+        self.assertIsNone(Task.objects.get(pk=task.pk).completed_at)
+        task.completed = True
+        Task.objects.bulk_update([task], ["completed"])
+        self.assertIsNotNone(Task.objects.get(pk=task.pk).completed_at)
+
+    def test_archive_moves_old_completed_tasks_in_batches(self):
+        out = StringIO()
+        call_command("archive_tasks", "--days", "30", "--batch-size", "2", stdout=out)
+        self.assertIn("Archivadas 3 tareas", out.getvalue())
+
+        self.assertEqual(
+            set(Task.objects.values_list("title", flat=True)),
+            {"Pendiente vieja", "Completada hoy", "Informe reciente"},
+        )
+        archived = ArchivedTask.objects.get(pk=self.old_done[0].pk)
+        self.assertEqual(archived.completed_at, self.old)
+        self.assertEqual(archived.subtasks.get().title, "paso archivado")
+        self.assertFalse(Subtask.objects.exists())
+        # Las activas quedan en total/completed y las archivadas aparte;
+        # el resumen del usuario no cambia por archivar.
+        self.assertEqual(stats_row(self.user, None), (3, 2))
+        self.assertEqual(TaskStats.objects.get(user=self.user).archived, 3)
+        self.assertEqual(stats.verify_stats(), [])
+        response = self.client.get("/api/tasks/stats/")
+        self.assertEqual(
+            (response.data["total"], response.data["completed"], response.data["archived"]),
+            (6, 5, 3),
+        )
+        self.assertEqual(response.data["by_category"][0]["total"], 6)
+
+        # Volver a correrlo no hace nada (ya no quedan candidatas)
+        out = StringIO()
+        call_command("archive_tasks", "--days", "30", stdout=out)
+        self.assertIn("Archivadas 0 tareas", out.getvalue())
+
+    def test_archive_batch_rechecks_cutoff_under_lock(self):
+        ids = [t.pk for t in self.old_done]
+        # Se descompletó y volvió a completar después de buscar los ids
+        task = Task.objects.get(pk=ids[0])
+        task.completed = False
+        task.save()
+        task.completed = True
+        task.save()
+        self.assertEqual(archive.archive_batch(ids, 30), 2)
+        self.assertTrue(Task.objects.filter(pk=ids[0]).exists())
+
+    def test_archive_batch_queries_do_not_grow_with_batch_size(self):
+        tasks = Task.objects.bulk_create([
+            Task(title=f"Lote {i}", user=self.user, completed=True) for i in range(10)
+        ])
+        Subtask.objects.bulk_create([
+            Subtask(task=task, title=f"paso {j}") for task in tasks for j in range(5)
+        ])
+        ids = [task.pk for task in tasks]
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(archive.archive_batch(ids, 0), 10)
+        # lock + copia (1 + 3) + borrado (5) + recálculo de TaskStats (4), sin savepoints
+        queries = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertLessEqual(len(queries), 13)
+        self.assertEqual(
+            events.get_broker().published,
+            [(self.user.pk, "task.deleted", {"id": pk}) for pk in ids],
+        )
+        self.assertEqual(stats.verify_stats(), [])
+
+    def test_archived_tasks_are_listed_on_demand_searchable_and_exportable(self):
+        call_command("archive_tasks", "--days", "30", stdout=StringIO())
+
+        response = self.client.get("/api/tasks/")
+        self.assertEqual(len(response.data), 3)
+        response = self.client.get("/api/tasks/?include_archived=true&search=informe&compact=true")
+        # Primero las activas que coinciden, después las archivadas
+        self.assertEqual(
+            [("archived_at" in t) for t in response.json()],
+            [False, True, True, True],
+        )
+        self.assertEqual(response.json()[0]["title"], "Informe reciente")
+
+        response = self.client.get("/api/archived-tasks/?search=viejo 1")
+        self.assertEqual([t["title"] for t in response.data], ["Informe viejo 1"])
+
+        response = self.client.get("/api/archived-tasks/export/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertTrue(response.is_async)
+        lines = async_to_sync(collect_stream)(response).decode().splitlines()
+        self.assertTrue(lines[0].startswith("id,title,"))
+        self.assertEqual(len(lines), 4)
+
+
+class FakeLLMServer:
+    """
+    Servidor local que imita POST /v1/chat/completions de OpenAI.
+    `script` es una lista de (demora_en_segundos, status) que se consume en
+    orden (el último se repite), para inyectar latencia y errores.
+    Con `drip` el cuerpo se manda de a un byte cada `drip` segundos.
+    """
+
+    def __init__(self, script, content="Trabajo", drip=None):
+        self.script = list(script)
+        self.content = content
+        self.drip = drip
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake.lock:
+                    fake.calls += 1
+                    delay, code = fake.script.pop(0) if len(fake.script) > 1 else fake.script[0]
+                time.sleep(delay)
+                if code == 200:
+                    body = {
+                        "id": "chatcmpl-test", "object": "chat.completion", "created": 0,
+                        "model": "gpt-4o-mini",
+                        "choices": [{
+                            "index": 0, "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": fake.content},
+                        }],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                    }
+                else:
+                    body = {"error": {"message": "fallo inyectado", "type": "server_error"}}
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(code)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    if fake.drip is None:
+                        self.wfile.write(payload)
+                        return
+                    for i in range(len(payload)):
+                        if fake.stopped.wait(fake.drip):
+                            return  # al cerrar el servidor cortamos la respuesta
+                        self.wfile.write(payload[i:i + 1])
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # el cliente ya cortó por timeout
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LLMGuardTests(SimpleTestCase):
+    """Timeouts, reintentos, límite de concurrencia y circuit breaker de ai_service."""
+
+    def use(self, server, **guard_kwargs):
+        guard_kwargs.setdefault("backoff_base", 0.01)
+        env = {"OPENAI_BASE_URL": server.url, "OPENAI_API_KEY": "test-key"}
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        guard = ai_service.LLMGuard(**guard_kwargs)
+        patcher = mock.patch.object(ai_service, "llm_guard", guard)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return guard
+
+    def test_retries_transient_errors(self):
+        with FakeLLMServer([(0, 500), (0, 503), (0, 200)]) as server:
+            self.use(server, max_attempts=3)
+            self.assertEqual(ai_service.suggest_category("Informe", "", ["Trabajo"]), "Trabajo")
+            self.assertEqual(server.calls, 3)
+
+    def test_deadline_bounds_slow_provider(self):
+        with FakeLLMServer([(2, 200)]) as server:
+            self.use(server, timeout=0.3)
+            start = time.monotonic()
+            with self.assertRaises(ai_service.AIUnavailableError):
+                ai_service.suggest_category("Informe", "", ["Trabajo"])
+            self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_deadline_bounds_slow_drip_response(self):
+        # Cada byte llega antes del timeout de lectura del cliente, pero el total no
+        with FakeLLMServer([(0, 200)], drip=0.1) as server:
+            self.use(server, timeout=0.5)
+            start = time.monotonic()
+            with self.assertRaises(ai_service.AIUnavailableError):
+                ai_service.suggest_category("Informe", "", ["Trabajo"])
+            self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_request_errors_do_not_open_breaker(self):
+        with FakeLLMServer([(0, 400)]) as server:
+            guard = self.use(server, breaker=ai_service.CircuitBreaker(failure_threshold=1))
+            self.assertEqual(ai_service.suggest_category("Informe", "", ["Trabajo"]), "General")
+            self.assertEqual(guard.breaker.state, "closed")
+            self.assertEqual(server.calls, 1)  # tampoco se reintenta
+
+    def test_auth_errors_open_breaker(self):
+        with FakeLLMServer([(0, 401)]) as server:
+            guard = self.use(server, breaker=ai_service.CircuitBreaker(failure_threshold=1))
+            with self.assertRaises(ai_service.AIUnavailableError):
+                ai_service.suggest_category("Informe", "", ["Trabajo"])
+            self.assertEqual(guard.breaker.state, "open")
+
+    def test_breaker_opens_and_fails_fast(self):
+        with FakeLLMServer([(0, 500)]) as server:
+            guard = self.use(
+                server, max_attempts=1,
+                breaker=ai_service.CircuitBreaker(failure_threshold=2, reset_timeout=60),
+            )
+            for _ in range(2):
+                self.assertIsNone(ai_service.suggest_next_subtask("Mudanza"))
+            self.assertEqual(guard.breaker.state, "open")
+            self.assertIsNone(ai_service.suggest_next_subtask("Mudanza"))
+            self.assertEqual(server.calls, 2)  # la tercera ni llegó al servidor
+
+    def test_breaker_half_open_probe_closes_on_success(self):
+        now = [0.0]
+        breaker = ai_service.CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        now[0] = 11
+        self.assertTrue(breaker.allow())   # una sola llamada de prueba
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_concurrency_cap_rejects_extra_calls(self):
+        with FakeLLMServer([(0.5, 200)]) as server:
+            self.use(server, max_concurrency=1, slot_wait=0.05)
+            results = []
+            first = threading.Thread(
+                target=lambda: results.append(ai_service.suggest_category("A", "", ["Trabajo"]))
+            )
+            first.start()
+            time.sleep(0.2)  # la primera ya tiene el único cupo
+            with self.assertRaises(ai_service.AIUnavailableError):
+                ai_service.suggest_category("B", "", ["Trabajo"])
+            first.join()
+            self.assertEqual(results, ["Trabajo"])
+            self.assertEqual(server.calls, 1)
+
+
+async def collect_stream(response):
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+def stats_row(user, category):
+    row = TaskStats.objects.get(user=user, category=category)
+    return (row.total, row.completed)
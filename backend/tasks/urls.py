@@ -1,13 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CategoryViewSet, SubtaskViewSet
+from .views import TaskViewSet, CategoryViewSet, SubtaskViewSet, ArchivedTaskViewSet, event_stream
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'categories', CategoryViewSet)
 router.register(r'subtasks', SubtaskViewSet, basename='subtask')
+router.register(r'archived-tasks', ArchivedTaskViewSet, basename='archived-task')
 
 # URLS de la API
 urlpatterns = [
+    path('events/', event_stream, name='events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
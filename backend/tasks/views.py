@@ -1,13 +1,23 @@
+import csv
+
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.filters import SearchFilter
 from django.shortcuts import get_object_or_404
-from .models import Task, Category, Subtask
-from .serializers import TaskSerializer, CategorySerializer, SubtaskSerializer
-from .ai_service import suggest_category
+from django.db.models import DateTimeField, Prefetch
+from django.utils import timezone
+from django.http import JsonResponse, StreamingHttpResponse
+from .models import Task, Category, Subtask, ArchivedTask, ArchivedSubtask
+from .serializers import TaskSerializer, CategorySerializer, SubtaskSerializer, ArchivedTaskSerializer
+from .renderers import FastJSONRenderer
+from .ai_service import AIUnavailableError, suggest_category
+from .stats import get_user_stats
+from . import events
 from django.contrib.auth.models import User
 
 
@@ -16,18 +26,159 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated] # Solo logueados
 
+def _csv_param(request, name):
+    """Lee un query param separado por comas: ?fields=id,title -> ['id', 'title']."""
+    raw = request.query_params.get(name, '')
+    return [part.strip() for part in raw.split(',') if part.strip()]
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # La lista de tareas es el endpoint más pesado: JSON con orjson
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # Armar la lista desde .values() cuando solo se piden columnas
+    # (bench_task_list lo desactiva para comparar con el serializer)
+    values_fast_path = True
+    # ?search=texto busca en título y descripción
+    filter_backends = [SearchFilter]
+    search_fields = ['title', 'description']
+
+    def get_field_selection(self):
+        """
+        Campos a devolver en lecturas (GET), según los query params:
+          ?fields=id,title,completed   solo esos campos
+          ?compact=true                TaskSerializer.COMPACT_FIELDS (sin subtareas)
+          ?expand=subtasks             agrega las subtareas embebidas
+        Devuelve la lista de campos, o None para "todos" (comportamiento por defecto).
+        Se decide antes de armar el queryset para traer solo esas columnas.
+        """
+        if hasattr(self, '_field_selection'):
+            return self._field_selection
+
+        selection = None
+        if self.request.method == 'GET':
+            fields = _csv_param(self.request, 'fields')
+            expand = _csv_param(self.request, 'expand')
+            compact = self.request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+
+            invalid = set(expand) - set(TaskSerializer.EXPANDABLE_FIELDS)
+            if invalid:
+                raise ValidationError({"expand": f"No se puede expandir: {', '.join(sorted(invalid))}."})
+            invalid = set(fields) - set(TaskSerializer.Meta.fields)
+            if invalid:
+                raise ValidationError({"fields": f"Campos desconocidos: {', '.join(sorted(invalid))}."})
+
+            if fields or compact:
+                selection = fields or list(TaskSerializer.COMPACT_FIELDS)
+                selection += [name for name in expand if name not in selection]
+
+        self._field_selection = selection
+        return selection
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_field_selection())
+        return super().get_serializer(*args, **kwargs)
 
     # 1. Filtrar: Cada usuario solo ve SUS tareas
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Task.objects.filter(user=self.request.user).order_by('-created_at')
+        fields = self.get_field_selection()
+
+        if fields is None:
+            # Representación completa: traemos usuario/categoría con JOIN
+            # y las subtareas en una sola consulta extra (evita N+1).
+            queryset = queryset.select_related('user', 'category')
+        else:
+            # Solo las columnas que se van a serializar (+ la FK de los campos relacionados)
+            model_fields = {f.name for f in Task._meta.concrete_fields}
+            columns = {'id'}
+            for name in fields:
+                if name in model_fields:
+                    columns.add(name)
+                elif name in TaskSerializer.RELATED_FIELDS:
+                    relation = TaskSerializer.RELATED_FIELDS[name]
+                    source = TaskSerializer._declared_fields[name].source
+                    columns.update([relation, source.replace('.', '__')])
+                    queryset = queryset.select_related(relation)
+            queryset = queryset.only(*columns)
+
+        if fields is None or 'subtasks' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('subtasks', queryset=Subtask.objects.select_related('category'))
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_field_selection()
+        if fields is None or 'subtasks' in fields or not self.values_fast_path:
+            response = super().list(request, *args, **kwargs)
+        else:
+            response = Response(self._list_values(fields))
+
+        # ?include_archived=true: agrega al final las tareas archivadas
+        # (solo entonces se consulta la tabla de archivo).
+        if request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes'):
+            response.data.extend(self._list_archived(fields))
+        return response
+
+    def _list_values(self, fields):
+        # Camino rápido (?fields= / ?compact= sin subtareas): todos los campos son
+        # columnas, así que armamos los dicts directo desde la DB sin pasar por
+        # los campos del serializer.
+        paths = []
+        for name in fields:
+            if name in TaskSerializer.RELATED_FIELDS:
+                paths.append(TaskSerializer._declared_fields[name].source.replace('.', '__'))
+            else:
+                paths.append(name)
+        rows = self.filter_queryset(self.get_queryset()).values_list(*paths)
+        data = [dict(zip(fields, row)) for row in rows]
+
+        # Igual que el serializer: si la FK es NULL (ej. tarea sin categoría),
+        # el campo relacionado (category_name) no aparece en la respuesta...
+        related = [name for name in fields if name in TaskSerializer.RELATED_FIELDS]
+        # ...y las fechas con hora salen en la zona horaria actual (TIME_ZONE),
+        # no en la UTC con la que vienen de la DB.
+        datetimes = [
+            name for name in fields
+            if name not in related and isinstance(Task._meta.get_field(name), DateTimeField)
+        ]
+        if related or datetimes:
+            for item in data:
+                for name in related:
+                    if item[name] is None:
+                        del item[name]
+                for name in datetimes:
+                    if item[name] is not None:
+                        item[name] = timezone.localtime(item[name])
+        return data
+
+    def _list_archived(self, fields):
+        queryset = ArchivedTask.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = self.filter_queryset(queryset).select_related('user', 'category')
+        if fields is None or 'subtasks' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('subtasks', queryset=ArchivedSubtask.objects.select_related('category'))
+            )
+        if fields is not None:
+            # archived_at siempre va: es lo que distingue a una tarea archivada
+            fields = fields + ['archived_at']
+        return ArchivedTaskSerializer(queryset, many=True, fields=fields).data
 
     # 2. Crear: Asignar automáticamente el usuario logueado como dueño
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Endpoint: GET /api/tasks/stats/
+        Totales, completadas, vencidas y desglose por categoría del usuario.
+        Sale de los contadores de TaskStats, sin recorrer todas las tareas.
+        """
+        return Response(get_user_stats(request.user))
+
     @action(detail=True, methods=['post'])
     def categorize(self, request, pk=None):
         """
@@ -44,7 +195,11 @@ class TaskViewSet(viewsets.ModelViewSet):
 
         # 2. Llamamos al servicio de IA
         #    Le pasamos título, descripción y la lista de opciones
-        suggested_name = suggest_category(task.title, task.description, existing_categories)
+        try:
+            suggested_name = suggest_category(task.title, task.description, existing_categories)
+        except AIUnavailableError as e:
+            # La tarea queda como estaba; el cliente puede reintentar más tarde
+            return Response({"error": str(e)}, status=503)
         
         if not suggested_name:
             return Response({"error": "Error al consultar la IA."}, status=500)
@@ -57,6 +212,13 @@ class TaskViewSet(viewsets.ModelViewSet):
             # Actualizamos la tarea con la nueva categoría
             task.category = category
             task.save()
+
+            # Avisamos a las pestañas abiertas (GET /api/events/) que terminó el trabajo de IA
+            events.publish(request.user.pk, 'ai.completed', {
+                "job": "categorize",
+                "task": task.pk,
+                "suggested_category": category.name,
+            })
             
             return Response({
                 "message": f"Categoría asignada: {category.name}",
@@ -76,7 +238,8 @@ class SubtaskViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Subtask.objects.filter(task__user=self.request.user).order_by("created_at")
+        # select_related('task'): los signals sacan el dueño de la tarea cacheada
+        return Subtask.objects.filter(task__user=self.request.user).select_related('task').order_by("created_at")
 
     def perform_create(self, serializer):
         task_id = self.request.data.get("task")
@@ -105,9 +268,74 @@ class SubtaskViewSet(viewsets.ModelViewSet):
         if not suggestion:
             return Response({"error": "No se pudo generar sugerencia."}, status=500)
 
+        events.publish(request.user.pk, 'ai.completed', {
+            "job": "suggest_subtask",
+            "task": task.pk,
+            "suggestion": suggestion,
+        })
+
         # Devolvemos la sugerencia SIN crearla
         return Response(suggestion)
 
+class ArchivedTaskViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Endpoint: /api/archived-tasks/ (solo lectura)
+    Tareas movidas al archivo por el comando archive_tasks. Admite ?search=.
+    """
+    serializer_class = ArchivedTaskSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [SearchFilter]
+    search_fields = ['title', 'description']
+
+    def get_queryset(self):
+        return (
+            ArchivedTask.objects.filter(user=self.request.user)
+            .select_related('user', 'category')
+            .prefetch_related(Prefetch('subtasks', queryset=ArchivedSubtask.objects.select_related('category')))
+            .order_by('-created_at')
+        )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Endpoint: GET /api/archived-tasks/export/
+        Descarga las tareas archivadas (filtradas por ?search=) como CSV.
+        """
+        queryset = self.filter_queryset(
+            ArchivedTask.objects.filter(user=request.user).order_by('-created_at')
+        ).values_list(
+            'id', 'title', 'description', 'category__name', 'created_at', 'due_date',
+            'completed_at', 'subtask_count', 'subtasks_completed', 'archived_at',
+            # named=True: el iterable de tuplas simples no se puede recorrer con aiterator()
+            named=True,
+        )
+        header = [
+            'id', 'title', 'description', 'category', 'created_at', 'due_date',
+            'completed_at', 'subtask_count', 'subtasks_completed', 'archived_at',
+        ]
+        # Vamos escribiendo fila por fila: el archivo puede ser grande.
+        # Generador async: bajo ASGI un iterador sync se leería entero en
+        # memoria antes de empezar a enviar.
+        buffer = _Echo()
+        writer = csv.writer(buffer)
+
+        async def rows():
+            yield writer.writerow(header)
+            async for row in queryset.aiterator():
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="tareas_archivadas.csv"'
+        return response
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
 class CustomAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
         # 1. Obtenemos email y password del JSON
@@ -132,4 +360,60 @@ class CustomAuthToken(ObtainAuthToken):
             'token': token.key,
             'user_id': user.pk,
             'email': user.email
-        })
\ No newline at end of file
+        })
+
+
+# Segundos sin eventos tras los cuales mandamos un comentario ": ping"
+# (mantiene viva la conexión a través de proxies).
+SSE_HEARTBEAT_SECONDS = 15
+
+
+async def _sse_user(request):
+    """
+    Autenticación para el stream SSE. EventSource no permite enviar headers,
+    así que además de "Authorization: Token <key>" aceptamos ?token=<key>.
+    Si no hay token probamos con la sesión de Django.
+    """
+    key = request.GET.get('token')
+    header = request.headers.get('Authorization', '')
+    if not key and header.startswith('Token '):
+        key = header[len('Token '):].strip()
+    if key:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        return token.user if token and token.user.is_active else None
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def event_stream(request):
+    """
+    Endpoint: GET /api/events/
+    Stream SSE con los cambios de tareas/subtareas del usuario y los
+    resultados de IA (ver tasks/events.py). Requiere servidor ASGI.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"detail": "Método no permitido."}, status=405)
+    user = await _sse_user(request)
+    if user is None:
+        return JsonResponse({"detail": "Las credenciales de autenticación no se proveyeron."}, status=401)
+
+    subscription = events.get_broker().subscribe(user.pk)
+
+    async def stream():
+        try:
+            # retry: cuánto espera el navegador antes de reconectar
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield events.format_sse(event)
+        finally:
+            # Se ejecuta también cuando el cliente cierra la conexión
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no bufferizar el stream
+    return response
@@ -9,3 +9,9 @@ export function getApiUrl(path) {
   const p = path.startsWith("/") ? path : `/${path}`;
   return `${BASE_URL}${p}`;
 }
+
+// URL del stream SSE (GET /api/events/).
+// EventSource no permite enviar headers, así que el token va como query param.
+export function getEventsUrl(token) {
+  return getApiUrl(`/api/events/?token=${encodeURIComponent(token)}`);
+}
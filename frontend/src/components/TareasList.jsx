@@ -1,7 +1,7 @@
 import { useState, useEffect, Fragment } from "react";
 import axios from "axios";
 import { useAuth } from "../context/AuthContext";
-import { getApiUrl, getAuthHeaders } from "../api/client";
+import { getApiUrl, getAuthHeaders, getEventsUrl } from "../api/client";
 import { formatDate, toInputDate } from "../utils/dateUtils";
 
 // =========================================================================
@@ -84,7 +84,13 @@ export default function TareasList({ refresh }) {
     fetchTasks();
   }, [token]);
 
-  // 2. Cargar categorías al montar
+  // 2. Exponer fetchTasks al componente padre mediante la referencia 'refresh'
+  //    (la usa cuando el navegador no soporta EventSource)
+  useEffect(() => {
+    if (refresh != null) refresh.current = fetchTasks;
+  }, [refresh, token]);
+
+  // 3. Cargar categorías al montar
   useEffect(() => {
     if (!token) return;
     axios
@@ -93,10 +99,52 @@ export default function TareasList({ refresh }) {
       .catch(() => setCategories([]));
   }, [token]);
 
-  // 3. Exponer fetchTasks al componente padre mediante la referencia 'refresh'
+  // 4. Cambios en vivo (SSE): en lugar de recargar toda la lista, actualizamos
+  //    solo la tarea afectada (ej. cuando termina la categorización con IA).
   useEffect(() => {
-    if (refresh != null) refresh.current = fetchTasks;
-  }, [refresh]);
+    if (!token || typeof EventSource === "undefined") return;
+    const source = new EventSource(getEventsUrl(token));
+
+    // El servidor no reenvía lo publicado mientras estuvimos desconectados:
+    // cada vez que EventSource se reconecta, recargamos la lista completa.
+    let opened = false;
+    source.onopen = () => {
+      if (opened) fetchTasks();
+      opened = true;
+    };
+
+    // Trae una sola tarea y la reemplaza (o agrega) en la lista
+    function reloadTask(id) {
+      axios
+        .get(getApiUrl(`/api/tasks/${id}/`), { headers: getAuthHeaders(token) })
+        .then((res) =>
+          setTasks((prev) =>
+            prev.some((t) => t.id === id)
+              ? prev.map((t) => (t.id === id ? res.data : t))
+              : [res.data, ...prev]
+          )
+        )
+        .catch(() => {});
+    }
+
+    const onTask = (e) => reloadTask(JSON.parse(e.data).id);
+    const onSubtask = (e) => reloadTask(JSON.parse(e.data).task);
+    const onTaskDeleted = (e) => {
+      const { id } = JSON.parse(e.data);
+      setTasks((prev) => prev.filter((t) => t.id !== id));
+    };
+
+    source.addEventListener("task.created", onTask);
+    source.addEventListener("task.updated", onTask);
+    source.addEventListener("task.deleted", onTaskDeleted);
+    source.addEventListener("subtask.created", onSubtask);
+    source.addEventListener("subtask.updated", onSubtask);
+    source.addEventListener("subtask.deleted", onSubtask);
+    // ai.completed no se escucha: el resultado ya llega como task.updated
+    // (categorize) o no cambia la tarea (suggest_subtask).
+
+    return () => source.close();
+  }, [token]);
 
   // =======================================================================
   // MANEJADORES DE ACCIONES (TAREAS PADRE)
@@ -303,9 +351,8 @@ export default function TareasList({ refresh }) {
         const { message } = res.data;
         alert(message);
 
-        // 5. Recargamos la tabla para que aparezca la nueva categoría
-        // (Usamos la referencia que explicamos antes)
-        if (refresh?.current) refresh.current();
+        // 5. No recargamos la tabla: la nueva categoría llega por el stream
+        // de eventos (task.updated / ai.completed) y se actualiza solo esa tarea.
       })
       .catch((err) => {
         console.error(err);
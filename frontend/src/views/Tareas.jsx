@@ -1,6 +1,10 @@
 import { useRef } from 'react'
 import { TareasForm, TareasList } from '../components'
 
+// Con EventSource la tarea nueva llega a la lista por el stream de eventos
+// (task.created); sin él, hay que pedirle a la lista que recargue.
+const hasEventSource = typeof EventSource !== 'undefined'
+
 function Tareas() {
     // Referencia "puente" para comunicar el Formulario con la Lista.
     // TareasList guardará aquí su función de recarga (fetchTasks).
@@ -13,10 +17,10 @@ function Tareas() {
             
             {/* 
                 Formulario de creación.
-                onSuccess: Cuando se cree una tarea, ejecuta la función guardada en la referencia.
-                El operador ?.() asegura que solo se ejecute si la referencia no es null.
+                onSuccess: solo si no hay stream de eventos, ejecuta la función guardada
+                en la referencia. El operador ?.() asegura que solo se ejecute si no es null.
             */}
-            <TareasForm onSuccess={() => listRefreshRef.current?.()} />
+            <TareasForm onSuccess={hasEventSource ? undefined : () => listRefreshRef.current?.()} />
             
             <h2 className="text-base font-bold mt-6 mb-2">Lista de tareas</h2>
             
@@ -30,4 +34,4 @@ function Tareas() {
     )
 }
 
-export default Tareas
\ No newline at end of file
+export default Tareas